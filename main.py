@@ -1,48 +1,81 @@
 #!/usr/bin/env python3
 import csv
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import repeat
 import re
 from pathlib import Path
 import argparse
-from typing import Iterable, Dict, List, Tuple
+from typing import Iterable, DefaultDict, Dict, List, Optional, Tuple
 import sys
 
+# Patterns are compiled once at import time; the per-row helpers below call the
+# bound methods directly instead of going through re's internal pattern cache.
+_SPLIT_TN = re.compile(r"^([A-Za-z]+)(\d+)$")
+_DEV_NUM = re.compile(r"[\\/](\d+)\.")
+_WS = re.compile(r"\s+")
+
+# Single-pass mojibake cleanup: NBSP -> space, drop zero-widths and stray 'Â'
+# (which also turns 'Â°' into '°'); replacement chars before C/F become '°'.
+_MOJI_TT = str.maketrans({"\u00A0": " ", "\u200B": "", "Â": ""})
+_MOJI_RE = re.compile("\ufffd([CF])")
+
+# Read buffer for source CSVs; exports can be several MB, so use 1 MiB reads
+# instead of the default 8 KiB.
+_READ_BUFFER_SIZE = 1 << 20
+
+# ProcessPoolExecutor's upper bound for max_workers on Windows
+_WINDOWS_MAX_WORKERS = 61
+
 
 def last_token_after_dot(s: str) -> str:
-    parts = s.split(".")
-    return parts[-1].strip() if parts else s.strip()
+    # rpartition yields the whole string when there is no dot, like split()[-1]
+    return s.rpartition(".")[2].strip()
 
+@lru_cache(maxsize=1024)
 def split_type_number(obj_ref: str):
     """
     'AI1' -> ('AI', '1'), 'AV100' -> ('AV','100'); if no match, returns (obj_ref, '')
+    Cached, since the same object refs repeat across devices in an export.
     """
-    m = re.match(r"^([A-Za-z]+)(\d+)$", obj_ref.strip())
+    m = _SPLIT_TN.match(obj_ref.strip())
     if m:
         return m.group(1).upper(), m.group(2)
     return obj_ref.strip(), ""
 
+@lru_cache(maxsize=2048)
 def _normalize_mojibake(s: str) -> str:
     """Fix common mojibake artifacts like 'Â°' -> '°' and NBSPs.
     Also collapses stray replacement chars preceding C/F.
+    Cached, as a handful of unit strings make up most of the calls.
     """
     if not s:
         return s
-    # Normalize non-breaking space and zero-widths
-    s = s.replace("\u00A0", " ").replace("\u200B", "")
-    # Fix typical UTF-8->cp1252 mojibake for degree sign
-    s = s.replace("Â°", "°")
-    # Fix replacement-char sequences occasionally seen
-    s = s.replace("�C", "°C").replace("�F", "°F")
-    # If any lone 'Â' remain, drop them
-    s = s.replace("Â", "")
+    s = s.translate(_MOJI_TT)
+    # Fix replacement-char sequences occasionally seen. 'Â' is already gone at
+    # this point, so '\ufffdÂC' (a degree sign mangled twice) also becomes '°C'.
+    if "\ufffd" in s:
+        s = _MOJI_RE.sub(r"°\1", s)
     return s
 
 def _clean_ws(s: str) -> str:
     """Normalize mojibake, collapse whitespace, trim ends."""
     if s is None:
         return ""
-    s = _normalize_mojibake(str(s))
+    s = str(s)
+    if "\u00A0" in s or "\u200B" in s or "Â" in s or "\ufffd" in s:
+        s = _normalize_mojibake(s)
+    else:
+        # Fast path for typical cells: once trimmed, a printable string holds
+        # no whitespace other than plain spaces, so only double spaces need work
+        t = s.strip()
+        if "  " not in t and t.isprintable():
+            return t
     # Collapse any runs of whitespace to single spaces, then trim
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _WS.sub(" ", s).strip()
     return s
 
 def _sanitize_cell(s: str, empty_placeholder: str) -> str:
@@ -57,7 +90,7 @@ def extract_dev_number_from_ref(ref: str) -> str:
     Looks for digits between a slash/backslash and a dot.
     Returns '' if not found.
     """
-    m = re.search(r"[\\/](\d+)\.", ref)
+    m = _DEV_NUM.search(ref)
     return m.group(1) if m else ""
 
 def extract_units(value_field: str) -> str:
@@ -67,57 +100,66 @@ def extract_units(value_field: str) -> str:
     """
     s = value_field.strip().strip('"').replace("'", "")
     s = _normalize_mojibake(s)
-    # Common pattern: "<number> <units...>"
-    # Accept negative/decimal numbers, optionally scientific, then spaces then unit tokens
-    m = re.match(r"^[\s]*[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\s+(.+?)\s*$", s)
-    units = m.group(1) if m else ""
-    units = _normalize_mojibake(units)
-    return units
+    # Common pattern: "<number> <units...>"; split off the leading token and
+    # only accept it if it parses as a number (negative/decimal/scientific)
+    parts = s.split(None, 1)
+    if len(parts) != 2:
+        return ""
+    token = parts[0]
+    # float() also accepts nan/inf, '.5', '1.' and '1_0'; offline points report
+    # 'nan °C', so keep the old number shape: digits on both sides of any '.'
+    if "_" in token or not token.lstrip("+-")[:1].isdigit():
+        return ""
+    dot = token.find(".")
+    if dot != -1 and not token[dot + 1:dot + 2].isdigit():
+        return ""
+    try:
+        float(token)
+    except ValueError:
+        return ""
+    units = parts[1].strip()
+    if "\n" in units:
+        # Units never span lines in a multi-line cell
+        return ""
+    return _normalize_mojibake(units)
 
-def read_rows(input_path: Path, encoding: str = "utf-8", delimiter: str = ","):
+def iter_rows(input_path: Path, encoding: str = "utf-8", delimiter: str = ","):
     """
-    Reads the source CSV.
+    Streams parsed rows from the source CSV.
     Assumes:
       col0 = full object ref (e.g., '//Morisset/10409.AV28')
       col4 = point name (Name)
       col5 = value-with-units (to derive Units)
     Skips the first line assuming it's a header (as per prior files).
+    Yields (obj_type, obj_num, name, units, dev_number, dev_name) tuples.
     """
-    out = []
-    with input_path.open("r", encoding=encoding, newline="") as f:
+    with input_path.open("r", buffering=_READ_BUFFER_SIZE, encoding=encoding, newline="") as f:
         reader = csv.reader(f, delimiter=delimiter)
         # skip header
         try:
             next(reader)
         except StopIteration:
-            return out
+            return
 
         for row in reader:
             if len(row) < 6:
                 continue
             obj_ref_full = _clean_ws(row[0])
             name = _clean_ws(row[4])
-            value_field = row[5].strip()
 
             obj_ref = last_token_after_dot(obj_ref_full)  # e.g., AV28
             obj_type, obj_num = split_type_number(obj_ref)
-            units = extract_units(value_field)
+            units = extract_units(row[5])  # strips the raw cell itself
             dev_number = extract_dev_number_from_ref(obj_ref_full)
             dev_name = ""  # user will input per device during writing
 
-            out.append((obj_type, obj_num, name, units, dev_number, dev_name))
-    return out
+            yield (obj_type, obj_num, name, units, dev_number, dev_name)
 
 def sort_rows(rows: Iterable[tuple]) -> list:
     rows = list(rows)
-    def s_key(r):
-        t, n, *_ = r
-        try:
-            ni = int(n) if n else 0
-        except ValueError:
-            ni = 0
-        return (t.upper(), ni)
-    rows.sort(key=s_key)
+    # list.sort evaluates the key once per row; Object_Number comes from
+    # split_type_number's digit group, so it is either all digits or empty.
+    rows.sort(key=lambda r: (r[0].upper(), int(r[1]) if r[1] else 0))
     return rows
 
 def write_csv(
@@ -130,23 +172,87 @@ def write_csv(
     empty_placeholder: str = "",
 ):
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    # Write with UTF-8 BOM for better Excel compatibility (avoids displaying 'Â°')
-    with output_path.open("w", encoding="utf-8-sig", newline="") as out:
+    # Write with UTF-8 BOM for better Excel compatibility (avoids displaying 'Â°').
+    # The BOM is emitted once by hand so the rest goes through the plain utf-8 codec.
+    with output_path.open("w", encoding="utf-8", newline="") as out:
+        out.write("\ufeff")
         writer = csv.writer(out, delimiter=",", lineterminator="\n")
         if write_header:
             writer.writerow(["Object_Type", "Object_Number", "Name", "Units", "Building", "DEV_Number", "DEV_Name"])
-        for (obj_type, obj_num, name, units, dev_number, dev_name) in rows:
-            # Sanitize each field; fill Building and DEV_Name from user input
-            out_row = [
-                _sanitize_cell(obj_type, empty_placeholder),
-                _sanitize_cell(obj_num, empty_placeholder),
+        # Sanitize each field; fill Building and DEV_Name from user input.
+        # Those two are the same for every row, so clean them once up front.
+        building_clean = _sanitize_cell(building, empty_placeholder)
+        dev_name_clean = _sanitize_cell(dev_name_override, empty_placeholder)
+
+        def _out_row(row):
+            obj_type, obj_num, name, units, dev_number, _dev_name = row
+            # Type, number and DEV number come out of iter_rows already cleaned
+            # (a trimmed token of the cleaned ref, or digit runs), so they only
+            # need the empty placeholder applied.
+            return [
+                obj_type or empty_placeholder,
+                obj_num or empty_placeholder,
                 _sanitize_cell(name, empty_placeholder),
                 _sanitize_cell(units, empty_placeholder),
-                _sanitize_cell(building, empty_placeholder),
-                _sanitize_cell(dev_number, empty_placeholder),
-                _sanitize_cell(dev_name_override, empty_placeholder),
+                building_clean,
+                dev_number or empty_placeholder,
+                dev_name_clean,
             ]
-            writer.writerow(out_row)
+
+        # Rows without quotes, newlines or embedded commas need no quoting, so
+        # join them directly and leave the rest to csv.writer
+        write = out.write
+        for r in rows:
+            fields = _out_row(r)
+            line = ",".join(fields)
+            if '"' in line or "\n" in line or "\r" in line or line.count(",") != len(fields) - 1:
+                writer.writerow(fields)
+            else:
+                write(line + "\n")
+
+def _find_csvs(root: Path):
+    """Yields every .csv file under root, walking directories with os.scandir."""
+    if not root.is_dir():
+        return
+    stack = [root]
+    while stack:
+        # Unreadable directories are skipped, as Path.glob did
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(".csv"):
+                        yield Path(entry.path)
+        except PermissionError:
+            continue
+
+def _parse_groups(src: Path, encoding: str, delimiter: str) -> Dict[str, List[Tuple]]:
+    """
+    Parses one source CSV into sorted row groups keyed by DEV_Number.
+    Rows without a DEV number are grouped under the source file stem.
+    """
+    fallback_key = src.stem
+    rows = iter_rows(src, encoding=encoding, delimiter=delimiter)
+    # Most exports hold a single device, so collect into one list and only
+    # switch to a dict once a second DEV number shows up
+    first_key = None
+    first_rows: List[Tuple] = []
+    for r in rows:
+        key = r[4] or fallback_key  # dev_number
+        if first_key is None:
+            first_key = key
+        elif key != first_key:
+            groups: DefaultDict[str, List[Tuple]] = defaultdict(list)
+            groups[first_key] = first_rows
+            groups[key].append(r)
+            for r in rows:
+                groups[r[4] or fallback_key].append(r)
+            return {key: sort_rows(g_rows) for key, g_rows in groups.items()}
+        first_rows.append(r)
+    if first_key is None:
+        return {}
+    return {first_key: sort_rows(first_rows)}
 
 def process_all_raw(
     raw_dir: Path,
@@ -157,64 +263,85 @@ def process_all_raw(
     building: str,
     write_header: bool,
     empty_placeholder: str,
+    jobs: Optional[int] = None,
 ):
-    csv_files = sorted([p for p in raw_dir.glob("**/*") if p.is_file() and p.suffix.lower() == ".csv"])
+    csv_files = sorted(_find_csvs(raw_dir))
     if not csv_files:
         print(f"No CSV files found in '{raw_dir}'. Nothing to do.")
         return
-    for src in csv_files:
-        rows = read_rows(src, encoding=encoding, delimiter=delimiter)
-        if not rows:
-            print(f"No usable rows in {src}, skipping.")
-            continue
-        # Group rows by DEV_Number; use source stem as fallback if missing
-        groups: Dict[str, List[Tuple]] = {}
-        for r in rows:
-            dev_number = r[4] if len(r) >= 5 else ""
-            key = dev_number if dev_number else src.stem
-            groups.setdefault(key, []).append(r)
+    # Parse and sort every source in worker processes; prompting and writing
+    # stay sequential so prompts are asked in order and shared outputs don't race.
+    # Results are consumed one file at a time, so the user can answer prompts
+    # while later files are still parsing and earlier files are written even
+    # if a later one fails.
+    cpus = os.cpu_count() or 1
+    workers = min(jobs or cpus, len(csv_files))
+    if sys.platform == "win32":
+        # ProcessPoolExecutor rejects more than 61 workers on Windows
+        cpus = min(cpus, _WINDOWS_MAX_WORKERS)
+        workers = min(workers, _WINDOWS_MAX_WORKERS)
+    # Without --jobs, let the executor pick (and clamp) the count itself unless
+    # there are fewer files than CPUs
+    max_workers = None if jobs is None and workers == cpus else workers
+    pool = ProcessPoolExecutor(max_workers=max_workers) if workers > 1 else None
+    with pool if pool is not None else nullcontext():
+        parse_map = pool.map if pool is not None else map
+        parsed = parse_map(_parse_groups, csv_files, repeat(encoding), repeat(delimiter))
+        for src, groups in zip(csv_files, parsed):
+            if not groups:
+                print(f"No usable rows in {src}, skipping.")
+                continue
 
-        for key, g_rows in groups.items():
-            g_rows = sort_rows(g_rows)
-            dst = processed_dir / f"{key}.csv"
-            try:
-                # Prompt user for device name for this output file
-                while True:
-                    src_display = str(src.relative_to(raw_dir)) if src.is_relative_to(raw_dir) else src.name
-                    dev_name_input = _clean_ws(
-                        input(f"Enter Device Name for {key} (source: {src_display}): ")
-                    )
-                    if dev_name_input:
-                        break
-                    print("Device Name cannot be empty. Please enter a value.")
-                write_csv(
-                    g_rows,
-                    dst,
-                    building,
-                    dev_name_input,
-                    write_header=write_header,
-                    empty_placeholder=empty_placeholder,
-                )
-                print(f"Converted: {src} -> {dst}")
-            except PermissionError:
-                alt = dst.with_name(f"{dst.stem}_new{dst.suffix}")
+            src_display = str(src.relative_to(raw_dir)) if src.is_relative_to(raw_dir) else src.name
+            for key, g_rows in groups.items():
+                dst = processed_dir / f"{key}.csv"
                 try:
-                    # Try alternate filename with same provided device name
+                    # Prompt user for device name for this output file
+                    while True:
+                        dev_name_input = _clean_ws(
+                            input(f"Enter Device Name for {key} (source: {src_display}): ")
+                        )
+                        if dev_name_input:
+                            break
+                        print("Device Name cannot be empty. Please enter a value.")
                     write_csv(
                         g_rows,
-                        alt,
+                        dst,
                         building,
                         dev_name_input,
                         write_header=write_header,
                         empty_placeholder=empty_placeholder,
                     )
-                    print(
-                        f"WARNING: Could not write {dst} (locked?). Wrote to {alt} instead."
-                    )
+                    print(f"Converted: {src} -> {dst}")
                 except PermissionError:
-                    print(
-                        f"ERROR: Could not write {dst} or {alt}. Close any open apps (e.g., Excel) holding the file and retry."
-                    )
+                    alt = dst.with_name(f"{dst.stem}_new{dst.suffix}")
+                    try:
+                        # Try alternate filename with same provided device name
+                        write_csv(
+                            g_rows,
+                            alt,
+                            building,
+                            dev_name_input,
+                            write_header=write_header,
+                            empty_placeholder=empty_placeholder,
+                        )
+                        print(
+                            f"WARNING: Could not write {dst} (locked?). Wrote to {alt} instead."
+                        )
+                    except PermissionError:
+                        print(
+                            f"ERROR: Could not write {dst} or {alt}. Close any open apps (e.g., Excel) holding the file and retry."
+                        )
+
+def _positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
 
 def parse_args():
     """
@@ -237,6 +364,12 @@ def parse_args():
         default="",
         help="Value to use for empty cells after trimming (default: empty)",
     )
+    p.add_argument(
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Worker processes used to parse input files (default: CPU count; at most 61 on Windows; 1 disables)",
+    )
     return p.parse_args()
 
 def main():
@@ -260,6 +393,7 @@ def main():
         building=building,
         write_header=not args.no_header,
         empty_placeholder=args.empty_placeholder,
+        jobs=args.jobs,
     )
 
 if __name__ == "__main__":